@@ -0,0 +1,148 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import lru_cache
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+
+from conexao import redis_client
+
+# Configuração do hashing (scrypt da stdlib libera o GIL, então roda bem em threads)
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_DKLEN = 64
+SCRYPT_MAXMEM = 64 * 1024 * 1024
+HASH_PREFIX = "scrypt"
+
+# Pool limitado: no máximo HASH_WORKERS hashes simultâneos, o resto aguarda na fila
+HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", "4"))
+_hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="auth-hash")
+
+# Configuração das sessões
+SESSION_TTL_SECONDS = int(os.getenv("AUTH_SESSION_TTL_SECONDS", str(60 * 60 * 12)))
+# Cada worker guarda sessões em memória por até LOCAL_CACHE_TTL_SECONDS. O logout só limpa o
+# cache do worker que o atendeu, então nos demais o token continua aceito até esse prazo vencer.
+LOCAL_CACHE_TTL_SECONDS = int(os.getenv("AUTH_LOCAL_CACHE_TTL_SECONDS", "5"))
+LOCAL_CACHE_MAX_ITEMS = 10000
+
+_sessoes_locais: dict[str, tuple[float, dict]] = {}
+_sessoes_lock = threading.Lock()
+
+
+def _chave_sessao(token: str) -> str:
+    return f"session:{token}"
+
+
+def _gerar_hash_sync(password_plaintext: str) -> str:
+    salt = secrets.token_bytes(16)
+    digest = hashlib.scrypt(
+        password_plaintext.encode("utf-8"),
+        salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P,
+        maxmem=SCRYPT_MAXMEM, dklen=SCRYPT_DKLEN
+    )
+    return f"{HASH_PREFIX}${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${salt.hex()}${digest.hex()}"
+
+
+@lru_cache(maxsize=1)
+def _hash_ficticio() -> str:
+    return _gerar_hash_sync(secrets.token_urlsafe(16))
+
+
+def hash_legado(password_hash: str) -> bool:
+    return not password_hash.startswith(f"{HASH_PREFIX}$")
+
+
+def _verificar_hash_sync(password_plaintext: str, password_hash: str | None) -> bool:
+    if not password_hash:
+        # Usuário inexistente: calcula um scrypt mesmo assim para não revelar pelo tempo de resposta
+        _verificar_hash_sync(password_plaintext, _hash_ficticio())
+        return False
+    if hash_legado(password_hash):
+        # Usuários antigos com senha em texto puro (o scrypt fictício mantém o mesmo tempo de resposta)
+        _verificar_hash_sync(password_plaintext, _hash_ficticio())
+        return hmac.compare_digest(password_plaintext.encode("utf-8"), password_hash.encode("utf-8"))
+    partes = password_hash.split("$")
+    if len(partes) != 6:
+        return False
+    _, n, r, p, salt_hex, digest_hex = partes
+    try:
+        digest = hashlib.scrypt(
+            password_plaintext.encode("utf-8"),
+            salt=bytes.fromhex(salt_hex), n=int(n), r=int(r), p=int(p),
+            maxmem=SCRYPT_MAXMEM, dklen=len(digest_hex) // 2
+        )
+    except ValueError:
+        return False
+    return hmac.compare_digest(digest.hex(), digest_hex)
+
+
+async def gerar_hash_senha(password_plaintext: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, _gerar_hash_sync, password_plaintext)
+
+
+async def verificar_senha(password_plaintext: str, password_hash: str | None) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, _verificar_hash_sync, password_plaintext, password_hash)
+
+
+def _guardar_sessao_local(token: str, sessao: dict) -> None:
+    expira_em = min(time.monotonic() + LOCAL_CACHE_TTL_SECONDS, sessao["_expira_monotonic"])
+    with _sessoes_lock:
+        if len(_sessoes_locais) >= LOCAL_CACHE_MAX_ITEMS:
+            agora = time.monotonic()
+            for chave in [k for k, (exp, _) in _sessoes_locais.items() if exp <= agora]:
+                del _sessoes_locais[chave]
+            if len(_sessoes_locais) >= LOCAL_CACHE_MAX_ITEMS:
+                _sessoes_locais.pop(next(iter(_sessoes_locais)))
+        _sessoes_locais[token] = (expira_em, sessao)
+
+
+def criar_sessao(usuario: dict) -> str:
+    token = secrets.token_urlsafe(32)
+    sessao = {
+        "id_user": usuario["id_user"],
+        "username": usuario["username"],
+        "data_login": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+    }
+    redis_client.set(_chave_sessao(token), json.dumps(sessao), ex=SESSION_TTL_SECONDS)
+    _guardar_sessao_local(token, {**sessao, "_expira_monotonic": time.monotonic() + SESSION_TTL_SECONDS})
+    return token
+
+
+def buscar_sessao(token: str) -> dict | None:
+    if not token:
+        return None
+    agora = time.monotonic()
+    with _sessoes_lock:
+        item = _sessoes_locais.get(token)
+    if item:
+        expira_em, sessao = item
+        if expira_em > agora:
+            return {k: v for k, v in sessao.items() if not k.startswith("_")}
+        with _sessoes_lock:
+            _sessoes_locais.pop(token, None)
+
+    chave = _chave_sessao(token)
+    pipe = redis_client.pipeline()
+    pipe.get(chave)
+    pipe.ttl(chave)
+    sessao_raw, ttl_restante = pipe.execute()
+    if not sessao_raw:
+        return None
+    sessao = json.loads(sessao_raw)
+    ttl_restante = ttl_restante if ttl_restante and ttl_restante > 0 else LOCAL_CACHE_TTL_SECONDS
+    _guardar_sessao_local(token, {**sessao, "_expira_monotonic": agora + ttl_restante})
+    return sessao
+
+
+def encerrar_sessao(token: str) -> bool:
+    with _sessoes_lock:
+        _sessoes_locais.pop(token, None)
+    return redis_client.delete(_chave_sessao(token)) == 1
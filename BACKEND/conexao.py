@@ -1,11 +1,108 @@
-from pymongo import MongoClient
-import redis
+from contextvars import ContextVar
+import os
+import threading
+
+MONGO_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
+MONGO_DB_NAME = "lista_tarefas"
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+CONEXAO_TIMEOUT_SEGUNDOS = float(os.getenv("CONEXAO_TIMEOUT_SEGUNDOS", "3"))
+
+# Os clientes só são criados no primeiro uso, então importar este módulo
+# (ou func/main) não abre sockets nem inicia threads de monitoramento.
+
+_clientes: dict = {}
+_clientes_lock = threading.Lock()
+
+# Clientes vinculados ao contexto atual (por requisição, via usar_clientes). Quando vazios,
+# os proxies abaixo usam os clientes padrão do processo.
+_redis_atual: ContextVar = ContextVar("redis_atual", default=None)
+_db_atual: ContextVar = ContextVar("db_atual", default=None)
+
+def _obter_ou_criar(nome: str, fabrica):
+    cliente = _clientes.get(nome)
+    if cliente is None:
+        with _clientes_lock:
+            cliente = _clientes.get(nome)
+            if cliente is None:
+                cliente = _clientes[nome] = fabrica()
+    return cliente
+
+def _criar_mongo_client():
+    from pymongo import MongoClient
+    return MongoClient(
+        MONGO_URI,
+        connect=False,
+        serverSelectionTimeoutMS=int(CONEXAO_TIMEOUT_SEGUNDOS * 1000)
+    )
+
+def _criar_redis_client():
+    import redis
+    return redis.Redis(
+        host=REDIS_HOST, port=REDIS_PORT, db=0, decode_responses=True,
+        socket_connect_timeout=CONEXAO_TIMEOUT_SEGUNDOS
+    )
+
+def get_mongo_client():
+    return _obter_ou_criar("mongo", _criar_mongo_client)
+
+def get_db():
+    return get_mongo_client()[MONGO_DB_NAME]
+
+def get_redis_client():
+    return _obter_ou_criar("redis", _criar_redis_client)
+
+# Dependências do FastAPI; sobrescreva-as em app.dependency_overrides nos testes
+async def obter_redis():
+    return get_redis_client()
+
+async def obter_db():
+    return get_db()
+
+def usar_clientes(redis_client=None, db=None) -> None:
+    if redis_client is not None:
+        _redis_atual.set(redis_client)
+    if db is not None:
+        _db_atual.set(db)
+
+def _redis_resolvido():
+    cliente = _redis_atual.get()
+    return cliente if cliente is not None else get_redis_client()
+
+def _db_resolvido():
+    db = _db_atual.get()
+    return db if db is not None else get_db()
+
+
+class _ProxyPreguicoso:
+    def __init__(self, fabrica):
+        object.__setattr__(self, "_fabrica", fabrica)
+
+    def __getattr__(self, nome):
+        return getattr(self._fabrica(), nome)
+
+    def __repr__(self):
+        return f"<proxy preguiçoso para {self._fabrica.__name__}>"
+
+
+def _colecao(nome: str):
+    def fabrica():
+        return _db_resolvido()[nome]
+    fabrica.__name__ = f"colecao_{nome}"
+    return _ProxyPreguicoso(fabrica)
+
 
 # Configuração do MongoDB
-cliente  = MongoClient('mongodb://localhost:27017/')
-db = cliente['lista_tarefas']
-colecao_tarefas = db['tarefas']
-colecao_usuarios = db['usuarios']
+colecao_tarefas = _colecao("tarefas")
+colecao_usuarios = _colecao("usuarios")
+colecao_tarefas_arquivadas = _colecao("tarefas_arquivadas")
 
 # Configuração do Redis
-redis_client = redis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
+redis_client = _ProxyPreguicoso(_redis_resolvido)
+
+
+def verificar_mongo() -> None:
+    get_mongo_client().admin.command("ping")
+
+def verificar_redis() -> None:
+    get_redis_client().ping()
@@ -1,15 +1,25 @@
-from conexao import colecao_tarefas, colecao_usuarios, redis_client
-from datetime import datetime, timezone
+from conexao import colecao_tarefas, colecao_tarefas_arquivadas, colecao_usuarios, redis_client
+from datetime import datetime, timedelta, timezone
+from bson import BSON, Binary
+import os
 import uuid
+import zlib
 
-def criar_usuario_func(username: str, password_plaintext: str) -> str:
+GLOBAL_TAGS_TOP_KEY = "global:tags:top"
+GLOBAL_DAILY_TTL_SECONDS = 86400 * 90
+STATUS_TAREFA = ["pendente", "em andamento", "concluída"]
+
+class TarefaArquivadaError(Exception):
+    pass
+
+def criar_usuario_func(username: str, password_hash: str) -> str:
     if colecao_usuarios.find_one({"username": username}):
         raise ValueError(f"Usuário com username '{username}' já existe.")
     user_uuid = str(uuid.uuid4())
     novo_usuario_doc = {
         "id_user": user_uuid,
         "username": username,
-        "password": password_plaintext,
+        "password": password_hash,
         "data_criacao": datetime.now(timezone.utc)
     }
     colecao_usuarios.insert_one(novo_usuario_doc)
@@ -21,6 +31,12 @@ def buscar_usuario_por_id_func(id_user_param: str) -> dict | None:
 def buscar_usuario_por_username_func(username: str) -> dict | None:
     return colecao_usuarios.find_one({"username": username}, {"password": 0, "_id": 0})
 
+def atualizar_senha_usuario_func(id_user_param: str, password_hash: str) -> None:
+    colecao_usuarios.update_one({"id_user": id_user_param}, {"$set": {"password": password_hash}})
+
+def buscar_credenciais_por_username_func(username: str) -> dict | None:
+    return colecao_usuarios.find_one({"username": username}, {"_id": 0, "id_user": 1, "username": 1, "password": 1})
+
 def _formatar_tarefa_para_frontend(tarefa_db: dict) -> dict | None:
     if not tarefa_db:
         return None
@@ -89,10 +105,16 @@ def criar_tarefa(tarefa_data: dict) -> str:
     redis_user_segment = user_id_criador
     initial_status = nova_tarefa_doc.get("status", "pendente")
     redis_client.incr(f"user:{redis_user_segment}:tasks:status:{initial_status}")
+    redis_client.incr(f"global:tasks:status:{initial_status}")
     today_key = now_utc.strftime("%Y-%m-%d")
     redis_client.incr(f"user:{redis_user_segment}:tasks:created_today:{today_key}")
+    redis_client.incr(f"global:tasks:created:{today_key}")
+    redis_client.expire(f"global:tasks:created:{today_key}", GLOBAL_DAILY_TTL_SECONDS)
     for tag in nova_tarefa_doc.get("tags", []):
         redis_client.zincrby(f"user:{redis_user_segment}:tags:top", 1, tag)
+        redis_client.zincrby(GLOBAL_TAGS_TOP_KEY, 1, tag)
+    registrar_usuario_ativo(user_id_criador, now_utc)
+    _indexar_tags_tarefa(redis_user_segment, task_uuid, nova_tarefa_doc.get("tags", []))
 
     return task_uuid
 
@@ -103,13 +125,16 @@ def listar_tarefas() -> list[dict]:
         if fmt: tarefas_formatadas.append(fmt)
     return tarefas_formatadas
 
-def buscar_tarefa_por_id_func(task_uuid_param: str) -> dict | None:
+def buscar_tarefa_por_id_func(task_uuid_param: str, incluir_arquivadas: bool = True) -> dict | None:
     tarefa_db = colecao_tarefas.find_one({"id": task_uuid_param})
+    if not tarefa_db and incluir_arquivadas:
+        tarefa_db = _desarquivar_documento(colecao_tarefas_arquivadas.find_one({"id": task_uuid_param}))
     return _formatar_tarefa_para_frontend(tarefa_db)
 
 def atualizar_tarefa(task_uuid_param: str, dados_atualizacao: dict, solicitante_id_user: str):
     tarefa_antiga = colecao_tarefas.find_one({"id": task_uuid_param})
     if not tarefa_antiga:
+        _garantir_nao_arquivada(task_uuid_param)
         print(f"Erro: Tarefa com ID UUID '{task_uuid_param}' não encontrada para atualização.")
         return None
 
@@ -162,11 +187,15 @@ def atualizar_tarefa(task_uuid_param: str, dados_atualizacao: dict, solicitante_
         if old_status != new_status:
             redis_client.decr(f"user:{redis_user_segment}:tasks:status:{old_status}")
             redis_client.incr(f"user:{redis_user_segment}:tasks:status:{new_status}")
+            redis_client.decr(f"global:tasks:status:{old_status}")
+            redis_client.incr(f"global:tasks:status:{new_status}")
             
             if new_status == 'concluída':
                 today_key_str = now_utc.strftime("%Y-%m-%d")
                 redis_client.incr(f"user:{redis_user_segment}:tasks:completed:{today_key_str}")
                 redis_client.expire(f"user:{redis_user_segment}:tasks:completed:{today_key_str}", 86400 * 60)
+                redis_client.incr(f"global:tasks:completed:{today_key_str}")
+                redis_client.expire(f"global:tasks:completed:{today_key_str}", GLOBAL_DAILY_TTL_SECONDS)
 
                 data_criacao_tarefa_db = tarefa_antiga.get("data_criacao")
                 
@@ -181,30 +210,35 @@ def atualizar_tarefa(task_uuid_param: str, dados_atualizacao: dict, solicitante_
                         redis_client.incr(f"user:{redis_user_segment}:stats:total_completed_tasks_count")
         
         old_tags = set(tarefa_antiga.get("tags", []))
-        new_tags = set(payload_set.get("tags", old_tags if "tags" in payload_set else []))
+        new_tags = set(payload_set["tags"]) if "tags" in payload_set else old_tags
         tags_removed = old_tags - new_tags
         tags_added = new_tags - old_tags
-        for tag in tags_removed: redis_client.zincrby(f"user:{redis_user_segment}:tags:top", -1, tag)
-        for tag in tags_added: redis_client.zincrby(f"user:{redis_user_segment}:tags:top", 1, tag)
+        _registrar_diferenca_tags(redis_user_segment, task_uuid_param, tags_removed, tags_added)
+        registrar_usuario_ativo(solicitante_id_user, now_utc)
         
     return result
 
 def adicionar_tag_a_tarefa(task_uuid_param: str, tag_nova: str, solicitante_id_user: str):
     tarefa = colecao_tarefas.find_one({"id": task_uuid_param})
     if not tarefa:
+        _garantir_nao_arquivada(task_uuid_param)
         return None
     if tarefa.get("user_id") != solicitante_id_user:
         raise PermissionError(f"Usuário '{solicitante_id_user}' não autorizado a modificar tags desta tarefa.")
 
     now_utc = datetime.now(timezone.utc)
-    return colecao_tarefas.update_one(
+    result = colecao_tarefas.update_one(
         {"id": task_uuid_param},
         {"$addToSet": {"tags": tag_nova}, "$set": {"data_atualizacao": now_utc}}
     )
+    if result and tag_nova not in tarefa.get("tags", []):
+        _registrar_diferenca_tags(str(tarefa.get("user_id", "anonimo")), task_uuid_param, set(), {tag_nova})
+    return result
 
-def atualizar_tag_tarefa(task_uuid_param: str, tag_antiga: str, tag_nova: str, str, solicitante_id_user: str):
+def atualizar_tag_tarefa(task_uuid_param: str, tag_antiga: str, tag_nova: str, solicitante_id_user: str):
     tarefa = colecao_tarefas.find_one({"id": task_uuid_param})
     if not tarefa:
+        _garantir_nao_arquivada(task_uuid_param)
         return None
     if tarefa.get("user_id") != solicitante_id_user:
         raise PermissionError(f"Usuário '{solicitante_id_user}' não autorizado a modificar tags desta tarefa.")
@@ -219,29 +253,45 @@ def atualizar_tag_tarefa(task_uuid_param: str, tag_antiga: str, tag_nova: str, s
             {"id": task_uuid_param},
             {"$addToSet": {"tags": tag_nova}, "$set": {"data_atualizacao": now_utc}}
         )
+
+    old_tags = set(tarefa.get("tags", []))
+    new_tags = ((old_tags - {tag_antiga}) if tag_antiga in old_tags else old_tags) | {tag_nova}
+    _registrar_diferenca_tags(str(tarefa.get("user_id", "anonimo")), task_uuid_param, old_tags - new_tags, new_tags - old_tags)
     return result
 
 def deletar_tarefa(task_uuid_param: str, solicitante_id_user: str):
+    colecao_origem = colecao_tarefas
     tarefa_a_deletar = colecao_tarefas.find_one({"id": task_uuid_param})
+    if not tarefa_a_deletar:
+        colecao_origem = colecao_tarefas_arquivadas
+        tarefa_a_deletar = colecao_tarefas_arquivadas.find_one({"id": task_uuid_param}, {"payload": 0})
     if not tarefa_a_deletar:
         return None
     
     if tarefa_a_deletar.get("user_id") != solicitante_id_user:
         raise PermissionError(f"Usuário '{solicitante_id_user}' não autorizado a deletar a tarefa '{task_uuid_param}'.")
 
-    result = colecao_tarefas.delete_one({"id": task_uuid_param})
+    result = colecao_origem.delete_one({"id": task_uuid_param})
     if result and result.deleted_count == 1:
         redis_user_segment = str(tarefa_a_deletar.get("user_id", "anonimo"))
         task_status = tarefa_a_deletar.get("status", "pendente")
         redis_client.decr(f"user:{redis_user_segment}:tasks:status:{task_status}")
+        redis_client.decr(f"global:tasks:status:{task_status}")
         tags_da_tarefa_deletada = tarefa_a_deletar.get("tags", [])
         for tag in tags_da_tarefa_deletada:
             redis_client.zincrby(f"user:{redis_user_segment}:tags:top", -1, tag)
+            redis_client.zincrby(GLOBAL_TAGS_TOP_KEY, -1, tag)
+        registrar_usuario_ativo(solicitante_id_user)
+        _desindexar_tags_tarefa(redis_user_segment, task_uuid_param, tags_da_tarefa_deletada)
     return result
 
-def buscar_tarefas_por_criterio(criterio: dict) -> list[dict]:
+def buscar_tarefas_por_criterio(criterio: dict, incluir_arquivadas: bool = False) -> list[dict]:
+    tarefas_db = list(colecao_tarefas.find(criterio).sort("data_criacao", -1))
+    if incluir_arquivadas:
+        arquivadas = [_desarquivar_documento(doc) for doc in colecao_tarefas_arquivadas.find(criterio)]
+        tarefas_db = sorted(tarefas_db + arquivadas, key=lambda t: t.get("data_criacao") or datetime.min, reverse=True)
     tarefas_encontradas = []
-    for tarefa_db in colecao_tarefas.find(criterio).sort("data_criacao", -1):
+    for tarefa_db in tarefas_db:
         fmt = _formatar_tarefa_para_frontend(tarefa_db)
         if fmt: tarefas_encontradas.append(fmt)
     return tarefas_encontradas
@@ -249,6 +299,7 @@ def buscar_tarefas_por_criterio(criterio: dict) -> list[dict]:
 def adicionar_comentario(task_uuid_param: str, id_autor_param: str, comentario_texto: str):
     if not id_autor_param or not buscar_usuario_por_id_func(id_autor_param):
         raise ValueError(f"ID de autor ('{id_autor_param}') inválido para adicionar comentário.")
+    _garantir_nao_arquivada(task_uuid_param)
     now_utc = datetime.now(timezone.utc)
     novo_comentario_doc = {
         "id_comentario": str(uuid.uuid4()),
@@ -256,10 +307,247 @@ def adicionar_comentario(task_uuid_param: str, id_autor_param: str, comentario_t
         "comentario": comentario_texto,
         "data": now_utc
     }
-    return colecao_tarefas.update_one(
+    result = colecao_tarefas.update_one(
         {"id": task_uuid_param},
         {"$push": {"comentarios": novo_comentario_doc}, "$set": {"data_atualizacao": now_utc}}
     )
+    if result and result.modified_count == 1:
+        registrar_usuario_ativo(id_autor_param, now_utc)
+    return result
+
+# --- Arquivamento de Tarefas Concluídas ---
+
+ARQUIVO_IDADE_DIAS = int(os.getenv("ARQUIVO_IDADE_DIAS", "30"))
+ARQUIVO_COMPRIMIR = os.getenv("ARQUIVO_COMPRIMIR", "1") == "1"
+ARQUIVO_RETENCAO_DIAS = int(os.getenv("ARQUIVO_RETENCAO_DIAS", "0"))
+ARQUIVO_LOTE = 500
+CAMPOS_ARQUIVO_CONSULTAVEIS = ["id", "user_id", "status", "tags", "data_criacao", "data_atualizacao"]
+
+def _garantir_indices_arquivo() -> None:
+    colecao_tarefas_arquivadas.create_index("id", unique=True)
+    colecao_tarefas_arquivadas.create_index("user_id")
+    colecao_tarefas_arquivadas.create_index("data_arquivamento")
+
+def _arquivar_documento(tarefa_db: dict, momento: datetime, comprimir: bool) -> dict:
+    tarefa_db = {k: v for k, v in tarefa_db.items() if k != "_id"}
+    if not comprimir:
+        return {**tarefa_db, "data_arquivamento": momento, "comprimido": False}
+    doc = {campo: tarefa_db.get(campo) for campo in CAMPOS_ARQUIVO_CONSULTAVEIS}
+    doc["data_arquivamento"] = momento
+    doc["comprimido"] = True
+    doc["payload"] = Binary(zlib.compress(BSON.encode(tarefa_db)))
+    return doc
+
+def _desarquivar_documento(doc_arquivo: dict | None) -> dict | None:
+    if not doc_arquivo:
+        return None
+    if doc_arquivo.get("comprimido"):
+        return BSON(zlib.decompress(doc_arquivo["payload"])).decode()
+    return doc_arquivo
+
+def _garantir_nao_arquivada(task_uuid_param: str) -> None:
+    if colecao_tarefas_arquivadas.count_documents({"id": task_uuid_param}, limit=1):
+        raise TarefaArquivadaError(f"Tarefa '{task_uuid_param}' está arquivada e não pode ser alterada.")
+
+def arquivar_tarefas_concluidas(idade_dias: int = ARQUIVO_IDADE_DIAS, comprimir: bool = ARQUIVO_COMPRIMIR) -> int:
+    if idade_dias < 1:
+        raise ValueError("A idade mínima para arquivamento é de 1 dia.")
+    _garantir_indices_arquivo()
+    now_utc = datetime.now(timezone.utc)
+    limite = now_utc - timedelta(days=idade_dias)
+    arquivadas = 0
+    while True:
+        lote = list(colecao_tarefas.find({"status": "concluída", "data_atualizacao": {"$lt": limite}}).limit(ARQUIVO_LOTE))
+        if not lote:
+            break
+        for tarefa_db in lote:
+            colecao_tarefas_arquivadas.replace_one(
+                {"id": tarefa_db["id"]}, _arquivar_documento(tarefa_db, now_utc, comprimir), upsert=True
+            )
+            # Só remove se a tarefa não mudou desde a leitura; senão desfaz a cópia
+            result = colecao_tarefas.delete_one({"_id": tarefa_db["_id"], "data_atualizacao": tarefa_db.get("data_atualizacao")})
+            if result.deleted_count == 1:
+                arquivadas += 1
+            else:
+                colecao_tarefas_arquivadas.delete_one({"id": tarefa_db["id"]})
+        if len(lote) < ARQUIVO_LOTE:
+            break
+    return arquivadas
+
+def expurgar_tarefas_arquivadas(retencao_dias: int = ARQUIVO_RETENCAO_DIAS) -> int:
+    if retencao_dias <= 0:
+        return 0
+    limite = datetime.now(timezone.utc) - timedelta(days=retencao_dias)
+    expurgadas = 0
+    for doc_arquivo in colecao_tarefas_arquivadas.find({"data_arquivamento": {"$lt": limite}}, {"payload": 0}):
+        result = colecao_tarefas_arquivadas.delete_one({"_id": doc_arquivo["_id"]})
+        if result.deleted_count == 1:
+            expurgadas += 1
+            redis_user_segment = str(doc_arquivo.get("user_id", "anonimo"))
+            task_status = doc_arquivo.get("status", "concluída")
+            redis_client.decr(f"user:{redis_user_segment}:tasks:status:{task_status}")
+            redis_client.decr(f"global:tasks:status:{task_status}")
+            for tag in doc_arquivo.get("tags", []):
+                redis_client.zincrby(f"user:{redis_user_segment}:tags:top", -1, tag)
+                redis_client.zincrby(GLOBAL_TAGS_TOP_KEY, -1, tag)
+            _desindexar_tags_tarefa(redis_user_segment, doc_arquivo.get("id"), doc_arquivo.get("tags", []))
+    return expurgadas
+
+# --- Métricas Globais Redis ---
+
+def registrar_usuario_ativo(user_id: str, momento: datetime | None = None) -> None:
+    if not user_id:
+        return
+    momento = momento or datetime.now(timezone.utc)
+    chave = f"global:users:active:{momento.strftime('%Y-%m-%d')}"
+    pipe = redis_client.pipeline()
+    pipe.pfadd(chave, user_id)
+    pipe.expire(chave, GLOBAL_DAILY_TTL_SECONDS)
+    pipe.execute()
+
+def contar_usuarios_ativos(datas: list[str]) -> int:
+    if not datas:
+        return 0
+    return redis_client.pfcount(*[f"global:users:active:{data}" for data in datas])
+
+def semear_metricas_globais() -> dict[str, int]:
+    contagem_status = {status: 0 for status in STATUS_TAREFA}
+    contagem_tags: dict[str, int] = {}
+    for colecao in [colecao_tarefas, colecao_tarefas_arquivadas]:
+        for item in colecao.aggregate([{"$group": {"_id": "$status", "total": {"$sum": 1}}}]):
+            contagem_status[item["_id"]] = contagem_status.get(item["_id"], 0) + item["total"]
+        for item in colecao.aggregate([
+            {"$unwind": "$tags"},
+            {"$group": {"_id": "$tags", "total": {"$sum": 1}}}
+        ]):
+            contagem_tags[item["_id"]] = contagem_tags.get(item["_id"], 0) + item["total"]
+
+    chave_temporaria = f"{GLOBAL_TAGS_TOP_KEY}:seed:{uuid.uuid4().hex}"
+    pipe = redis_client.pipeline()
+    pipe.mset({f"global:tasks:status:{status}": total for status, total in contagem_status.items()})
+    if contagem_tags:
+        pipe.zadd(chave_temporaria, contagem_tags)
+        pipe.rename(chave_temporaria, GLOBAL_TAGS_TOP_KEY)
+    else:
+        pipe.delete(GLOBAL_TAGS_TOP_KEY)
+    pipe.execute()
+    return contagem_status
+
+# --- Índice de Tags Redis ---
+
+TAGS_LEX_GLOBAL_KEY = "tags:lex"
+TAGS_INDICE_PRONTO_KEY = "tags:indice:pronto"
+
+# KEYS: pares (índice do usuário, índice global) por tag, seguidos de lex do usuário e lex global.
+# ARGV: id da tarefa seguido das tags. SREM + SCARD + ZREM rodam atomicamente, então um
+# _indexar_tags_tarefa concorrente não consegue ter sua tag removida do autocomplete.
+_SCRIPT_DESINDEXAR = """
+local lex_usuario = KEYS[#KEYS - 1]
+local lex_global = KEYS[#KEYS]
+for i = 2, #ARGV do
+    local idx_usuario = KEYS[(i - 2) * 2 + 1]
+    local idx_global = KEYS[(i - 2) * 2 + 2]
+    redis.call('SREM', idx_usuario, ARGV[1])
+    redis.call('SREM', idx_global, ARGV[1])
+    if redis.call('SCARD', idx_usuario) == 0 then redis.call('ZREM', lex_usuario, ARGV[i]) end
+    if redis.call('SCARD', idx_global) == 0 then redis.call('ZREM', lex_global, ARGV[i]) end
+end
+return 1
+"""
+
+def _chave_indice_tag(tag: str, user_id: str | None = None) -> str:
+    if user_id:
+        return f"user:{user_id}:tags:idx:{tag}"
+    return f"tags:idx:{tag}"
+
+def _chave_lex_tags(user_id: str | None = None) -> str:
+    if user_id:
+        return f"user:{user_id}:tags:lex"
+    return TAGS_LEX_GLOBAL_KEY
+
+def _indexar_tags_tarefa(user_id: str, task_uuid: str, tags) -> None:
+    tags = list(tags)
+    if not tags:
+        return
+    pipe = redis_client.pipeline()
+    for tag in tags:
+        pipe.sadd(_chave_indice_tag(tag, user_id), task_uuid)
+        pipe.sadd(_chave_indice_tag(tag), task_uuid)
+    pipe.zadd(_chave_lex_tags(user_id), {tag: 0 for tag in tags})
+    pipe.zadd(_chave_lex_tags(), {tag: 0 for tag in tags})
+    pipe.execute()
+
+def _desindexar_tags_tarefa(user_id: str, task_uuid: str, tags) -> None:
+    tags = list(tags)
+    if not tags:
+        return
+    chaves = []
+    for tag in tags:
+        chaves += [_chave_indice_tag(tag, user_id), _chave_indice_tag(tag)]
+    chaves += [_chave_lex_tags(user_id), _chave_lex_tags()]
+    redis_client.eval(_SCRIPT_DESINDEXAR, len(chaves), *chaves, task_uuid, *tags)
+
+def _registrar_diferenca_tags(user_id: str, task_uuid: str, tags_removidas, tags_adicionadas) -> None:
+    for tag in tags_removidas:
+        redis_client.zincrby(f"user:{user_id}:tags:top", -1, tag)
+        redis_client.zincrby(GLOBAL_TAGS_TOP_KEY, -1, tag)
+    for tag in tags_adicionadas:
+        redis_client.zincrby(f"user:{user_id}:tags:top", 1, tag)
+        redis_client.zincrby(GLOBAL_TAGS_TOP_KEY, 1, tag)
+    _desindexar_tags_tarefa(user_id, task_uuid, tags_removidas)
+    _indexar_tags_tarefa(user_id, task_uuid, tags_adicionadas)
+
+def indice_tags_pronto() -> bool:
+    return redis_client.exists(TAGS_INDICE_PRONTO_KEY) == 1
+
+def buscar_ids_por_tags(tags: list[str], modo: str = "and", user_id: str | None = None) -> set[str]:
+    if not tags:
+        return set()
+    chaves = [_chave_indice_tag(tag, user_id) for tag in tags]
+    if modo == "or":
+        return redis_client.sunion(chaves)
+    return redis_client.sinter(chaves)
+
+def sugerir_tags(prefixo: str, user_id: str | None = None, limite: int = 10) -> list[str]:
+    inicio = b"[" + prefixo.encode("utf-8") if prefixo else b"-"
+    fim = b"[" + prefixo.encode("utf-8") + b"\xff" if prefixo else b"+"
+    return redis_client.zrangebylex(_chave_lex_tags(user_id), inicio, fim, start=0, num=limite)
+
+def reconstruir_indice_tags() -> int:
+    # Monta o índice em chaves temporárias e troca cada uma com RENAME, para que as buscas
+    # continuem vendo o índice antigo (e não um vazio) enquanto a reconstrução roda.
+    sufixo = f":reindex:{uuid.uuid4().hex}"
+    chaves_novas = set()
+    total_tarefas = 0
+    for colecao in [colecao_tarefas, colecao_tarefas_arquivadas]:
+        for tarefa_db in colecao.find({}, {"id": 1, "user_id": 1, "tags": 1}):
+            total_tarefas += 1
+            tags = tarefa_db.get("tags", [])
+            if not tags:
+                continue
+            user_id = str(tarefa_db.get("user_id", "anonimo"))
+            pipe = redis_client.pipeline(transaction=False)
+            for tag in tags:
+                for chave in (_chave_indice_tag(tag, user_id), _chave_indice_tag(tag)):
+                    pipe.sadd(chave + sufixo, tarefa_db.get("id"))
+                    chaves_novas.add(chave)
+            for chave in (_chave_lex_tags(user_id), _chave_lex_tags()):
+                pipe.zadd(chave + sufixo, {tag: 0 for tag in tags})
+                chaves_novas.add(chave)
+            pipe.execute()
+
+    chaves_antigas = set()
+    for key_pattern in ["user:*:tags:idx:*", "user:*:tags:lex", "tags:idx:*", TAGS_LEX_GLOBAL_KEY]:
+        chaves_antigas.update(k for k in redis_client.scan_iter(key_pattern) if not k.endswith(sufixo))
+
+    pipe = redis_client.pipeline(transaction=False)
+    for chave in chaves_novas:
+        pipe.rename(chave + sufixo, chave)
+    for chave in chaves_antigas - chaves_novas:
+        pipe.delete(chave)
+    pipe.set(TAGS_INDICE_PRONTO_KEY, datetime.now(timezone.utc).isoformat())
+    pipe.execute()
+    return total_tarefas
 
 # --- Funções de Métricas Redis ---
 
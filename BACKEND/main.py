@@ -1,16 +1,28 @@
+import time
+
+_inicio_import = time.perf_counter()
+
 from fastapi import FastAPI, HTTPException, Query, Depends
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Optional, Dict
 from datetime import datetime, timedelta, timezone
 import traceback
-import json
+import asyncio
+import os
 
 import func
-from conexao import redis_client
-import redis
+import auth
+from conexao import obter_db, obter_redis, usar_clientes, verificar_mongo, verificar_redis
+
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "2"))
 
-app = FastAPI(title="API Gerenciador de Tarefas")
+async def vincular_clientes(redis_client=Depends(obter_redis), db=Depends(obter_db)):
+    # Faz func e auth usarem os mesmos clientes injetados (inclusive os de dependency_overrides)
+    usar_clientes(redis_client, db)
+
+app = FastAPI(title="API Gerenciador de Tarefas", dependencies=[Depends(vincular_clientes)])
 
 app.add_middleware(
     CORSMiddleware,
@@ -37,6 +49,15 @@ class UserInDB(UserBase):
     id_user: str
     data_criacao: datetime
 
+class LoginPayload(UserBase):
+    password: str
+
+class LoginResponse(APIBaseModel):
+    access_token: str
+    token_type: str = "bearer"
+    id_user: str
+    username: str
+
 class ComentarioBase(APIBaseModel):
     comentario: str
 
@@ -75,14 +96,6 @@ class TarefaInDB(TarefaBase):
     data_atualizacao: datetime
     comentarios: List[ComentarioInDB] = []
 
-class APIBaseModel(BaseModel):
-    model_config = ConfigDict(
-        from_attributes=True,
-        json_encoders={
-            datetime: lambda dt: dt.isoformat().replace("+00:00", "Z")
-        }
-    )
-
 class TopTagItem(APIBaseModel):
     tag: str
     count: int
@@ -102,18 +115,48 @@ class WeeklyCompletionRate(APIBaseModel):
     tasks_completed_last_7_days: int
     message: Optional[str] = None
 
+class GlobalDailyItem(APIBaseModel):
+    date: str
+    active_users: int
+    tasks_created: int
+    tasks_completed: int
+
+class GlobalActiveUsers(APIBaseModel):
+    days: int
+    unique_active_users: int
+    daily: List[GlobalDailyItem]
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+async def obter_usuario_autenticado(credenciais: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)) -> dict:
+    if not credenciais or credenciais.scheme.lower() != "bearer":
+        raise HTTPException(status_code=401, detail="Token de autenticação não fornecido.", headers={"WWW-Authenticate": "Bearer"})
+    sessao = auth.buscar_sessao(credenciais.credentials)
+    if not sessao:
+        raise HTTPException(status_code=401, detail="Token de autenticação inválido ou expirado.", headers={"WWW-Authenticate": "Bearer"})
+    return sessao
+
 @app.on_event("startup")
 async def startup_event():
-    try:
-        redis_client.ping()
-        print("Conexão com Redis estabelecida com sucesso!")
-    except redis.exceptions.ConnectionError as e:
-        print(f"ERRO FATAL: Não foi possível conectar ao Redis. {e}")
+    for nome, verificar in [("MongoDB", verificar_mongo), ("Redis", verificar_redis)]:
+        inicio = time.perf_counter()
+        try:
+            await asyncio.to_thread(verificar)
+            print(f"Conexão com {nome} estabelecida com sucesso! ({time.perf_counter() - inicio:.3f}s)")
+        except Exception as e:
+            print(f"ERRO FATAL: Não foi possível conectar ao {nome} ({type(e).__name__}). {e}")
+
+    tempo_total = time.perf_counter() - _inicio_import
+    if tempo_total > STARTUP_BUDGET_SECONDS:
+        print(f"AVISO: Inicialização levou {tempo_total:.3f}s, acima do orçamento de {STARTUP_BUDGET_SECONDS:.3f}s.")
+    else:
+        print(f"Inicialização concluída em {tempo_total:.3f}s.")
 
 @app.post("/usuarios/", response_model=UserInDB, status_code=201, summary="Criar novo usuário")
 async def criar_novo_usuario_rota(usuario_data: UserCreate):
     try:
-        novo_user_id_uuid = func.criar_usuario_func(usuario_data.username, usuario_data.password)
+        senha_hash = await auth.gerar_hash_senha(usuario_data.password)
+        novo_user_id_uuid = func.criar_usuario_func(usuario_data.username, senha_hash)
         usuario_criado_doc = func.buscar_usuario_por_id_func(novo_user_id_uuid)
         if not usuario_criado_doc:
             raise HTTPException(status_code=500, detail="Erro ao recuperar usuário recém-criado.")
@@ -124,6 +167,35 @@ async def criar_novo_usuario_rota(usuario_data: UserCreate):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Erro interno ao criar usuário: {str(e)}")
 
+@app.post("/auth/login", response_model=LoginResponse, summary="Autenticar usuário e obter token")
+async def login_rota(login_data: LoginPayload):
+    try:
+        credenciais_doc = func.buscar_credenciais_por_username_func(login_data.username)
+        senha_hash = credenciais_doc.get("password") if credenciais_doc else None
+        if not await auth.verificar_senha(login_data.password, senha_hash) or not credenciais_doc:
+            raise HTTPException(status_code=401, detail="Usuário ou senha inválidos.")
+        if auth.hash_legado(senha_hash):
+            novo_hash = await auth.gerar_hash_senha(login_data.password)
+            func.atualizar_senha_usuario_func(credenciais_doc["id_user"], novo_hash)
+        token = auth.criar_sessao(credenciais_doc)
+        func.registrar_usuario_ativo(credenciais_doc["id_user"])
+        return LoginResponse(access_token=token, id_user=credenciais_doc["id_user"], username=credenciais_doc["username"])
+    except HTTPException as http_exc:
+        raise http_exc
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Erro interno ao autenticar usuário: {str(e)}")
+
+@app.post("/auth/logout", status_code=204, summary="Encerrar sessão do token atual")
+async def logout_rota(credenciais: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)):
+    if not credenciais or not auth.encerrar_sessao(credenciais.credentials):
+        raise HTTPException(status_code=401, detail="Token de autenticação inválido ou expirado.", headers={"WWW-Authenticate": "Bearer"})
+    return None
+
+@app.get("/auth/me", response_model=Dict[str, str], summary="Usuário autenticado pelo token atual")
+async def usuario_autenticado_rota(usuario_autenticado: dict = Depends(obter_usuario_autenticado)):
+    return {"id_user": usuario_autenticado["id_user"], "username": usuario_autenticado["username"]}
+
 @app.get("/usuarios/{id_user_param}", response_model=UserInDB, summary="Buscar usuário por ID")
 async def buscar_usuario_rota(id_user_param: str):
     try:
@@ -168,7 +240,10 @@ async def buscar_tarefas_por_criterio_rota(
     status: Optional[str] = Query(default=None, pattern="^(pendente|em andamento|concluída)$"),
     data_criacao_str: Optional[str] = Query(default=None, description="Formato AAAA-MM-DD", alias="data_criacao"),
     tag: Optional[str] = Query(default=None),
-    user_id: Optional[str] = Query(default=None, description="ID (UUID) do usuário")
+    tags: Optional[List[str]] = Query(default=None, description="Várias tags (repetir o parâmetro)"),
+    modo_tags: str = Query(default="and", pattern="^(and|or)$", description="'and' exige todas as tags, 'or' qualquer uma"),
+    user_id: Optional[str] = Query(default=None, description="ID (UUID) do usuário"),
+    incluir_arquivadas: bool = Query(default=False, description="Incluir tarefas concluídas já arquivadas", alias="include_archived")
 ):
     try:
         filtro: Dict[str, any] = {}
@@ -181,12 +256,19 @@ async def buscar_tarefas_por_criterio_rota(
                 filtro["data_criacao"] = {"$gte": start_date, "$lt": end_date}
             except ValueError:
                 raise HTTPException(status_code=400, detail="Formato de data inválido para 'data_criacao'. Use AAAA-MM-DD.")
-        if tag:
-            filtro["tags"] = tag
+        tags_filtro = list(tags or []) + ([tag] if tag else [])
+        if tags_filtro and func.indice_tags_pronto():
+            ids_por_tags = func.buscar_ids_por_tags(tags_filtro, modo_tags, user_id)
+            if not ids_por_tags:
+                return []
+            filtro["id"] = {"$in": list(ids_por_tags)}
+        elif tags_filtro:
+            # Índice ainda não reconstruído (manutencao.py reindexar-tags): filtra direto no Mongo
+            filtro["tags"] = {"$all": tags_filtro} if modo_tags == "and" else {"$in": tags_filtro}
         if user_id:
             filtro["user_id"] = user_id
 
-        tarefas_list_dict = func.buscar_tarefas_por_criterio(filtro)
+        tarefas_list_dict = func.buscar_tarefas_por_criterio(filtro, incluir_arquivadas)
         if not tarefas_list_dict and any(filtro.values()):
             return []
         return [TarefaInDB(**tarefa_dict) for tarefa_dict in tarefas_list_dict]
@@ -196,6 +278,18 @@ async def buscar_tarefas_por_criterio_rota(
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Erro ao buscar tarefas: {str(e)}")
 
+@app.get("/tags/autocomplete", response_model=List[str], summary="Sugestões de tags por prefixo")
+async def autocomplete_tags_rota(
+    prefixo: str = Query(default="", description="Início da tag"),
+    user_id: Optional[str] = Query(default=None, description="ID (UUID) do usuário; sem ele usa as tags de todos"),
+    limite: int = Query(10, gt=0, le=50)
+):
+    try:
+        return func.sugerir_tags(prefixo, user_id, limite)
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Erro ao sugerir tags: {str(e)}")
+
 @app.get("/tarefas/{task_uuid_param}", response_model=TarefaInDB, summary="Obter tarefa por ID")
 async def obter_tarefa_por_id_rota(task_uuid_param: str):
     try:
@@ -211,11 +305,10 @@ async def obter_tarefa_por_id_rota(task_uuid_param: str):
 async def atualizar_tarefa_existente_rota(
     task_uuid_param: str,
     tarefa_update_payload: TarefaUpdatePayload,
-    solicitante_id_user: str = Query(..., description="ID (UUID) do usuário que está fazendo a requisição")
+    usuario_autenticado: dict = Depends(obter_usuario_autenticado)
 ):
     try:
-        if not func.buscar_usuario_por_id_func(solicitante_id_user):
-            raise HTTPException(status_code=404, detail=f"Usuário solicitante com ID '{solicitante_id_user}' não encontrado.")
+        solicitante_id_user = usuario_autenticado["id_user"]
 
         dados_para_atualizar = tarefa_update_payload.model_dump(exclude_unset=True)
 
@@ -248,6 +341,8 @@ async def atualizar_tarefa_existente_rota(
 
     except PermissionError as pe:
         raise HTTPException(status_code=403, detail=str(pe))
+    except func.TarefaArquivadaError as tae:
+        raise HTTPException(status_code=409, detail=str(tae))
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
     except HTTPException as http_exc:
@@ -260,11 +355,10 @@ async def atualizar_tarefa_existente_rota(
 @app.delete("/tarefas/{task_uuid_param}", status_code=204, summary="Deletar tarefa")
 async def deletar_tarefa_rota(
     task_uuid_param: str,
-    solicitante_id_user: str = Query(..., description="ID (UUID) do usuário que está fazendo a requisição")
+    usuario_autenticado: dict = Depends(obter_usuario_autenticado)
 ):
     try:
-        if not func.buscar_usuario_por_id_func(solicitante_id_user):
-            raise HTTPException(status_code=404, detail=f"Usuário solicitante com ID '{solicitante_id_user}' não encontrado.")
+        solicitante_id_user = usuario_autenticado["id_user"]
 
         resultado_delete = func.deletar_tarefa(task_uuid_param, solicitante_id_user)
 
@@ -316,6 +410,8 @@ async def adicionar_comentario_rota(
         else:
             raise HTTPException(status_code=400, detail="Erro ao adicionar comentário ou tarefa não foi modificada.")
 
+    except func.TarefaArquivadaError as tae:
+        raise HTTPException(status_code=409, detail=str(tae))
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
     except HTTPException as http_exc:
@@ -325,7 +421,7 @@ async def adicionar_comentario_rota(
         raise HTTPException(status_code=500, detail=f"Erro interno ao adicionar comentário: {str(e)}")
 
 @app.get("/metrics/status", response_model=Dict[str, int], summary="Contagem de tarefas por status para um usuário")
-async def get_tasks_by_status_metrics(user_id: str = Query(..., description="ID (UUID) do usuário")):
+async def get_tasks_by_status_metrics(user_id: str = Query(..., description="ID (UUID) do usuário"), redis_client=Depends(obter_redis)):
     if not func.buscar_usuario_por_id_func(user_id):
         raise HTTPException(status_code=404, detail=f"Usuário com ID '{user_id}' não encontrado.")
 
@@ -338,7 +434,7 @@ async def get_tasks_by_status_metrics(user_id: str = Query(..., description="ID
     return metrics
 
 @app.get("/metrics/tasks-created-today", response_model=Dict[str, int], summary="Tarefas criadas hoje por um usuário")
-async def get_tasks_created_today_metrics(user_id: str = Query(..., description="ID (UUID) do usuário")):
+async def get_tasks_created_today_metrics(user_id: str = Query(..., description="ID (UUID) do usuário"), redis_client=Depends(obter_redis)):
     if not func.buscar_usuario_por_id_func(user_id):
         raise HTTPException(status_code=404, detail=f"Usuário com ID '{user_id}' não encontrado.")
 
@@ -348,7 +444,7 @@ async def get_tasks_created_today_metrics(user_id: str = Query(..., description=
     return {"count": int(count) if count else 0}
 
 @app.get("/metrics/top-tags", response_model=List[TopTagItem], summary="Tags mais usadas por um usuário")
-async def get_top_tags_metrics(user_id: str = Query(..., description="ID (UUID) do usuário"), count: int = Query(5, gt=0, le=20)):
+async def get_top_tags_metrics(user_id: str = Query(..., description="ID (UUID) do usuário"), count: int = Query(5, gt=0, le=20), redis_client=Depends(obter_redis)):
     if not func.buscar_usuario_por_id_func(user_id):
         raise HTTPException(status_code=404, detail=f"Usuário com ID '{user_id}' não encontrado.")
 
@@ -356,7 +452,7 @@ async def get_top_tags_metrics(user_id: str = Query(..., description="ID (UUID)
     return [{"tag": tag_name, "count": int(score)} for tag_name, score in top_tags_raw]
 
 @app.get("/metrics/completed-by-day", response_model=List[CompletedByDayItem], summary="Tarefas concluídas por dia por um usuário")
-async def get_completed_tasks_by_day_metrics(user_id: str = Query(..., description="ID (UUID) do usuário"), days: int = Query(7, gt=0, le=90)):
+async def get_completed_tasks_by_day_metrics(user_id: str = Query(..., description="ID (UUID) do usuário"), days: int = Query(7, gt=0, le=90), redis_client=Depends(obter_redis)):
     if not func.buscar_usuario_por_id_func(user_id):
         raise HTTPException(status_code=404, detail=f"Usuário com ID '{user_id}' não encontrado.")
 
@@ -371,7 +467,7 @@ async def get_completed_tasks_by_day_metrics(user_id: str = Query(..., descripti
     return list(reversed(completed_by_day))
 
 @app.get("/metrics/average-completion-time", response_model=AverageCompletionTime, summary="Tempo médio de conclusão de tarefas para um utilizador")
-async def get_average_completion_time_metrics(user_id: str = Query(..., description="ID (UUID) do utilizador")):
+async def get_average_completion_time_metrics(user_id: str = Query(..., description="ID (UUID) do utilizador"), redis_client=Depends(obter_redis)):
     if not func.buscar_usuario_por_id_func(user_id):
         raise HTTPException(status_code=404, detail=f"Utilizador com ID '{user_id}' não encontrado.")
 
@@ -395,7 +491,7 @@ async def get_average_completion_time_metrics(user_id: str = Query(..., descript
     )
 
 @app.get("/metrics/weekly-completion-rate", response_model=WeeklyCompletionRate, summary="Taxa de conclusão semanal de tarefas para um utilizador")
-async def get_weekly_completion_rate_metrics(user_id: str = Query(..., description="ID (UUID) do utilizador")):
+async def get_weekly_completion_rate_metrics(user_id: str = Query(..., description="ID (UUID) do utilizador"), redis_client=Depends(obter_redis)):
     if not func.buscar_usuario_por_id_func(user_id):
         raise HTTPException(status_code=404, detail=f"Utilizador com ID '{user_id}' não encontrado.")
 
@@ -427,4 +523,43 @@ async def get_weekly_completion_rate_metrics(user_id: str = Query(..., descripti
         rate=completion_rate,
         tasks_created_last_7_days=tasks_created_last_7_days,
         tasks_completed_last_7_days=tasks_completed_last_7_days
-    )
\ No newline at end of file
+    )
+
+@app.get("/metrics/global/status", response_model=Dict[str, int], summary="Contagem global de tarefas por status")
+async def get_global_tasks_by_status_metrics(redis_client=Depends(obter_redis)):
+    statuses = func.STATUS_TAREFA
+    counts = redis_client.mget([f"global:tasks:status:{status_val}" for status_val in statuses])
+    return {status_val: int(count) if count else 0 for status_val, count in zip(statuses, counts)}
+
+@app.get("/metrics/global/top-tags", response_model=List[TopTagItem], summary="Tags mais usadas por todos os usuários")
+async def get_global_top_tags_metrics(count: int = Query(5, gt=0, le=50), redis_client=Depends(obter_redis)):
+    top_tags_raw = redis_client.zrevrange(func.GLOBAL_TAGS_TOP_KEY, 0, count - 1, withscores=True)
+    return [{"tag": tag_name, "count": int(score)} for tag_name, score in top_tags_raw]
+
+@app.get("/metrics/global/active-users", response_model=GlobalActiveUsers, summary="Usuários ativos por dia (aproximado, HyperLogLog)")
+async def get_global_active_users_metrics(days: int = Query(7, gt=0, le=90), redis_client=Depends(obter_redis)):
+    base_date = datetime.now(timezone.utc)
+    datas = [(base_date - timedelta(days=i)).strftime("%Y-%m-%d") for i in reversed(range(days))]
+
+    pipe = redis_client.pipeline()
+    for date_key_str in datas:
+        pipe.pfcount(f"global:users:active:{date_key_str}")
+        pipe.get(f"global:tasks:created:{date_key_str}")
+        pipe.get(f"global:tasks:completed:{date_key_str}")
+    resultados = pipe.execute()
+
+    daily = []
+    for i, date_key_str in enumerate(datas):
+        active, created, completed = resultados[i * 3:i * 3 + 3]
+        daily.append(GlobalDailyItem(
+            date=date_key_str,
+            active_users=int(active or 0),
+            tasks_created=int(created) if created else 0,
+            tasks_completed=int(completed) if completed else 0
+        ))
+
+    return GlobalActiveUsers(
+        days=days,
+        unique_active_users=func.contar_usuarios_ativos(datas),
+        daily=daily
+    )
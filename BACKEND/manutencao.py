@@ -0,0 +1,45 @@
+import argparse
+
+import func
+
+
+def _dias_positivos(valor: str) -> int:
+    dias = int(valor)
+    if dias < 1:
+        raise argparse.ArgumentTypeError("informe pelo menos 1 dia")
+    return dias
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rotinas de manutenção do backend de tarefas")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+    subparsers.add_parser("reindexar-tags", help="Reconstrói o índice de tags no Redis a partir do MongoDB")
+    subparsers.add_parser("semear-metricas-globais", help="Recalcula status e tags globais no Redis a partir do MongoDB")
+
+    parser_arquivar = subparsers.add_parser("arquivar", help="Move tarefas concluídas antigas para tarefas_arquivadas")
+    parser_arquivar.add_argument("--idade-dias", type=_dias_positivos, default=func.ARQUIVO_IDADE_DIAS,
+                                 help="Arquivar concluídas sem atualização há pelo menos N dias")
+    parser_arquivar.add_argument("--sem-compressao", action="store_true", help="Guardar o documento completo sem zlib")
+
+    parser_expurgar = subparsers.add_parser("expurgar-arquivo", help="Apaga do arquivo as tarefas além do prazo de retenção")
+    parser_expurgar.add_argument("--retencao-dias", type=_dias_positivos, default=func.ARQUIVO_RETENCAO_DIAS or None,
+                                 required=not func.ARQUIVO_RETENCAO_DIAS,
+                                 help="Apagar tarefas arquivadas há mais de N dias")
+
+    args = parser.parse_args()
+    if args.comando == "reindexar-tags":
+        total = func.reconstruir_indice_tags()
+        print(f"Índice de tags reconstruído a partir de {total} tarefas.")
+    elif args.comando == "semear-metricas-globais":
+        contagem_status = func.semear_metricas_globais()
+        print(f"Métricas globais recalculadas: {contagem_status}")
+    elif args.comando == "arquivar":
+        arquivadas = func.arquivar_tarefas_concluidas(args.idade_dias, comprimir=not args.sem_compressao)
+        print(f"{arquivadas} tarefas arquivadas.")
+    elif args.comando == "expurgar-arquivo":
+        expurgadas = func.expurgar_tarefas_arquivadas(args.retencao_dias)
+        print(f"{expurgadas} tarefas arquivadas expurgadas.")
+
+
+if __name__ == "__main__":
+    main()
@@ -103,13 +103,44 @@ function App() {
     fetchTasks(currentSearchFilters);
   }, [currentSearchFilters]);
 
-  const handleLogin = (user: User) => {
-    setCurrentUser(user);
-    setCurrentSearchFilters({ user_id: user.id_user });
-    alert(`Utilizador ${user.username} autenticado! (ID: ${user.id_user})`);
+  const handleLogin = async (user: User) => {
+    const password = window.prompt(`Senha para ${user.username}:`);
+    if (password === null) return;
+    try {
+      const response = await axios.post<{
+        access_token: string;
+        id_user: string;
+        username: string;
+      }>('http://localhost:8000/auth/login', {
+        username: user.username,
+        password,
+      });
+      const authenticatedUser: User = {
+        id_user: response.data.id_user,
+        username: response.data.username,
+        access_token: response.data.access_token,
+      };
+      setCurrentUser(authenticatedUser);
+      setCurrentSearchFilters({ user_id: authenticatedUser.id_user });
+      alert(
+        `Utilizador ${authenticatedUser.username} autenticado! (ID: ${authenticatedUser.id_user})`
+      );
+    } catch (err: any) {
+      alert(
+        `Erro ao autenticar: ${err.response?.data?.detail || err.message}`
+      );
+      console.error('Erro ao autenticar:', err);
+    }
   };
 
   const handleLogout = () => {
+    if (currentUser?.access_token) {
+      axios
+        .post('http://localhost:8000/auth/logout', null, {
+          headers: { Authorization: `Bearer ${currentUser.access_token}` },
+        })
+        .catch((err) => console.error('Erro ao encerrar sessão:', err));
+    }
     setCurrentUser(null);
     setTasks([]);
     setCurrentSearchFilters({});
@@ -207,7 +238,7 @@ function App() {
     if (window.confirm('Tem certeza que deseja excluir esta tarefa?')) {
       try {
         await axios.delete(`http://localhost:8000/tarefas/${taskId}`, {
-          params: { solicitante_id_user: currentUser.id_user },
+          headers: { Authorization: `Bearer ${currentUser.access_token}` },
         });
         if (taskToView && taskToView.id === taskId) {
           handleCloseViewModal();
@@ -127,8 +127,8 @@ const TaskForm: React.FC<TaskFormProps> = ({
           `http://localhost:8000/tarefas/${taskToEdit.id}`,
           updatePayload,
           {
-            params: {
-              solicitante_id_user: currentUser.id_user,
+            headers: {
+              Authorization: `Bearer ${currentUser.access_token}`,
             },
           }
         );
@@ -5,6 +5,7 @@ export interface User {
   id_user: string; // UUID do usuário, vindo do backend (substitui o antigo 'id')
   username: string;
   data_criacao?: string;
+  access_token?: string; // Token de sessão devolvido por /auth/login
 }
 
 // --- Interfaces para Comentário ---